@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from enum import Enum
 
 
@@ -23,7 +23,7 @@ class TrackingMode(Enum):
     DUAL_AXIS = "dual_axis"
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Coordinate:
     latitude: float
     longitude: float
@@ -34,7 +34,7 @@ class Coordinate:
         return f"{abs(self.latitude)}°{lat_dir}, {abs(self.longitude)}°{lon_dir}"
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Quantity:
     value: float
     unit: str
@@ -43,7 +43,7 @@ class Quantity:
         return f"{self.value}{self.unit}"
 
 
-@dataclass
+@dataclass(slots=True)
 class Site:
     name: str
     location: Coordinate
@@ -56,7 +56,7 @@ class Site:
         return f"Site(name='{self.name}', location={self.location})"
 
 
-@dataclass
+@dataclass(slots=True)
 class Equipment:
     type: str  # panel, inverter, turbine, battery
     name: str
@@ -72,7 +72,7 @@ class Equipment:
         return f"Equipment(type='{self.type}', name='{self.name}', source={source})"
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class EquipmentRef:
     name: str
     count: Optional[int] = None
@@ -83,13 +83,13 @@ class EquipmentRef:
         return self.name
 
 
-@dataclass
+@dataclass(slots=True)
 class Layout:
     name: str
     panels: Optional[EquipmentRef] = None
     inverters: Optional[EquipmentRef] = None
     turbines: Optional[EquipmentRef] = None
-    orientation: Optional[str] = None
+    orientation: Optional[Orientation] = None
     tilt: Optional[float] = None  # degrees
     row_spacing: Optional[Quantity] = None
     tracking: Optional[TrackingMode] = None
@@ -99,22 +99,23 @@ class Layout:
         return f"Layout(name='{self.name}', panels={self.panels})"
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class WeatherSource:
     provider: str
-    args: List[str]
+    args: Tuple[str, ...]
     
     def __str__(self):
         args_str = ", ".join(f"'{arg}'" for arg in self.args)
         return f"{self.provider}({args_str})"
 
 
-@dataclass
+@dataclass(slots=True)
 class Simulation:
     weather: Optional[WeatherSource] = None
     duration: Optional[str] = None
     timestep: Optional[str] = None
     outputs: Optional[List[str]] = None
+    aoi_model: Optional[str] = None  # pvlib incidence-angle loss model
     
     def __post_init__(self):
         if self.outputs is None:
@@ -124,7 +125,7 @@ class Simulation:
         return f"Simulation(duration={self.duration}, timestep={self.timestep})"
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Constraint:
     variable: str
     operator: str
@@ -134,7 +135,7 @@ class Constraint:
         return f"{self.variable} {self.operator} {self.value}"
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Objective:
     mode: str  # maximize or minimize
     target: str
@@ -143,7 +144,7 @@ class Objective:
         return f"{self.mode}({self.target})"
 
 
-@dataclass
+@dataclass(slots=True)
 class Optimization:
     objective: Optional[Objective] = None
     variables: Optional[List[str]] = None
@@ -160,20 +161,20 @@ class Optimization:
         return f"Optimization(objective={self.objective}, vars={len(self.variables)})"
 
 
-@dataclass
+@dataclass(slots=True)
 class Model:
     """Complete RenewDSL Model"""
     site: Optional[Site] = None
-    equipment: List[Equipment] = None
-    layouts: List[Layout] = None
+    equipment: Dict[str, Equipment] = None  # keyed by name
+    layouts: Dict[str, Layout] = None  # keyed by name
     simulation: Optional[Simulation] = None
     optimization: Optional[Optimization] = None
     
     def __post_init__(self):
         if self.equipment is None:
-            self.equipment = []
+            self.equipment = {}
         if self.layouts is None:
-            self.layouts = []
+            self.layouts = {}
     
     def __repr__(self):
         parts = []
@@ -1,146 +1,198 @@
-from lark import Lark, Transformer, v_args
+import re
+import sys
 from .ast_nodes import (
     Site, Coordinate, Quantity, Equipment, EquipmentRef,
     Layout, Simulation, WeatherSource, Optimization,
-    Objective, Constraint, Model, TrackingMode
+    Objective, Constraint, Model, Orientation, TrackingMode
 )
-from typing import Any, List
-
-
-# TODO: Move grammar to separate file eventually
-GRAMMAR = r"""
-?start: statement+
-
-statement: site_def
-         | equipment_section
-         | layout_def
-         | simulate_def
-         | optimize_def
-
-site_def: "site" string ":" _NL _INDENT site_attr+ _DEDENT
-
-site_attr: "location" ":" coordinate _NL
-         | "area" ":" quantity _NL
-         | "terrain" ":" string _NL
-         | "irradiance" ":" quantity _NL
-         | "elevation" ":" quantity _NL
-
-coordinate: NUMBER "°" direction_ns "," NUMBER "°" direction_ew
-direction_ns: "N" | "S"
-direction_ew: "E" | "W"
-
-equipment_section: "equipment" ":" _NL _INDENT equipment_item+ _DEDENT
-
-equipment_item: equipment_type string spec_block? _NL
-
-equipment_type: "panel" | "inverter" | "turbine" | "battery"
-
-spec_block: ":" _NL _INDENT equipment_spec+ _DEDENT
-
-equipment_spec: NAME ":" (quantity | NUMBER | string) _NL
-
-layout_def: "layout" string ":" _NL _INDENT layout_attr+ _DEDENT
-
-layout_attr: "panels" ":" equipment_ref _NL
-           | "inverters" ":" equipment_ref _NL
-           | "orientation" ":" orientation _NL
-           | "tilt" ":" angle _NL
-           | "row_spacing" ":" quantity _NL
-           | "tracking" ":" tracking_mode _NL
-
-equipment_ref: NAME ("*" NUMBER)?
-
-orientation: "south" | "north" | "east" | "west"
-tracking_mode: "fixed" | "single_axis" | "dual_axis"
-angle: NUMBER "°"
-
-simulate_def: "simulate" ":" _NL _INDENT simulate_attr+ _DEDENT
-
-simulate_attr: "weather" ":" weather_source _NL
-             | "duration" ":" duration _NL
-             | "timestep" ":" duration _NL
-             | "outputs" ":" output_list _NL
-
-weather_source: NAME "(" string ("," string)* ")"
-
-output_list: "[" NAME ("," NAME)* "]"
-
-optimize_def: "optimize" ":" _NL _INDENT optimize_attr+ _DEDENT
-
-optimize_attr: "objective" ":" objective_expr _NL
-             | "variables" ":" variable_list _NL
-             | "algorithm" ":" string _NL
-
-objective_expr: ("maximize" | "minimize") "(" NAME ")"
-
-variable_list: "[" NAME ("," NAME)* "]"
-
-quantity: NUMBER unit
-
-unit: "m" | "km" | "hectares" | "kW" | "MW" | "kWh/m²/day" | "°" | "h" | "hour" | "day" | "year"
-
-duration: NUMBER unit
-
-string: ESCAPED_STRING
-
-NUMBER: /[0-9]+\.?[0-9]*/
-NAME: /[a-zA-Z_][a-zA-Z0-9_]*/
-
-_NL: /\r?\n/
-_INDENT: /<INDENT>/
-_DEDENT: /<DEDENT>/
-
-%import common.ESCAPED_STRING
-%import common.WS
-%ignore WS
-"""
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+
+class ParseError(ValueError):
+    """Raised when RenewDSL text does not match the grammar"""
+
+
+_TOKEN_RE = re.compile(r"""
+    (?P<NL>\n)
+  | (?P<INDENT><INDENT>)
+  | (?P<DEDENT><DEDENT>)
+  | (?P<NUMBER>[0-9]+\.?[0-9]*)
+  | (?P<STRING>"(?:[^"\\]|\\.)*")
+  | (?P<UNIT>kWh/m²/day|m²)
+  | (?P<NAME>[a-zA-Z_][a-zA-Z0-9_]*)
+  | (?P<OP>[:,()\[\]*°])
+  | (?P<WS>[ \t\r]+)
+""", re.VERBOSE)
+
+_UNITS = frozenset({
+    'm', 'm²', 'km', 'hectares', 'W', 'kW', 'MW', 'kWh/m²/day',
+    '°', 'h', 'hour', 'hours', 'day', 'days', 'year', 'years',
+})
+_POWER_UNITS_W = {'W': 1.0, 'kW': 1e3, 'MW': 1e6}
+_POWER_SPECS = frozenset({'capacity'})  # As are all canonical '*_w' keys
+_EQUIPMENT_TYPES = frozenset({'panel', 'inverter', 'turbine', 'battery'})
+_ORIENTATIONS = frozenset(orientation.value for orientation in Orientation)
+_TRACKING_MODES = frozenset(mode.value for mode in TrackingMode)
+_OBJECTIVE_MODES = frozenset({'maximize', 'minimize'})
+_AOI_MODELS = frozenset({'ashrae', 'physical', 'martin_ruiz', 'no_loss'})
+
+Token = Tuple[str, str, int]
+
+
+def tokenize(text: str) -> Iterator[Token]:
+    """Yield (kind, value, source line) tokens from preprocessed RenewDSL text"""
+    pos = 0
+    end = len(text)
+    line = 1
+    last_kind = 'NL'
+    last_raw_kind = 'NL'
+    while pos < end:
+        match = _TOKEN_RE.match(text, pos)
+        if match is None:
+            raise ParseError(f"line {line}: Unexpected character {text[pos]!r}")
+        kind = match.lastgroup
+        pos = match.end()
+        if kind == 'WS':
+            continue
+        token_line = line
+        if kind == 'NL':
+            # <DEDENT> markers sit on lines of their own that are not in the source
+            if last_raw_kind != 'DEDENT':
+                line += 1
+            last_raw_kind = kind
+            # Blank lines and the line break after a <DEDENT> marker carry no meaning
+            if last_kind in ('NL', 'DEDENT'):
+                continue
+        last_raw_kind = kind
+        yield (kind, match.group(), token_line)
+        last_kind = kind
+    yield ('EOF', '', line)
 
 
-class RenewDSLTransformer(Transformer):
-    """Transform parse tree into AST nodes"""
+class Parser:
+    """Recursive-descent parser building AST nodes directly from tokens"""
     
-    def __init__(self):
-        super().__init__()
+    def __init__(self, text: str):
+        # Tokens are pulled on demand with one token of lookahead, so lexing
+        # and parsing run as a single pass without a materialised token list
+        self.tokens = tokenize(text)
+        self.token = next(self.tokens)
+        self.line = self.token[2]  # Source line of the last consumed token
         self.model = Model()
     
-    @v_args(inline=True)
-    def string(self, s):
-        return s[1:-1]  # Remove quotes
-    
-    @v_args(inline=True)
-    def NUMBER(self, n):
-        return float(n)
-    
-    @v_args(inline=True)
-    def NAME(self, n):
-        return str(n)
+    def _error(self, message: str, line: int = None) -> ParseError:
+        return ParseError(f"line {line or self.line}: {message}")
+    
+    def _peek(self) -> Token:
+        return self.token
+    
+    def _next(self) -> Token:
+        token = self.token
+        self.line = token[2]
+        self.token = next(self.tokens, ('EOF', '', token[2]))
+        return token
+    
+    def _expect(self, kind: str, value: str = None) -> str:
+        tok_kind, tok_value, _ = self._next()
+        if tok_kind != kind or (value is not None and tok_value != value):
+            expected = repr(value) if value is not None else kind
+            got = 'end of input' if tok_kind == 'EOF' else repr(tok_value)
+            raise self._error(f"Expected {expected}, got {got}")
+        return tok_value
+    
+    def _expect_one_of(self, choices) -> str:
+        value = self._expect('NAME')
+        if value not in choices:
+            raise self._error(f"Expected one of {sorted(choices)}, got {value!r}")
+        # Keywords repeat throughout a model; share one string object each
+        return sys.intern(value)
+    
+    def _accept(self, kind: str, value: str = None) -> bool:
+        tok_kind, tok_value, _ = self.token
+        if tok_kind == kind and (value is None or tok_value == value):
+            self._next()
+            return True
+        return False
+    
+    def _parse_block(self, parse_item: Callable[[], Any]) -> List[Any]:
+        """Parse `":" NL INDENT item+ DEDENT`"""
+        self._expect('OP', ':')
+        self._expect('NL')
+        self._expect('INDENT')
+        items = [parse_item()]
+        while not self._accept('DEDENT'):
+            items.append(parse_item())
+        return items
     
-    @v_args(inline=True)
-    def coordinate(self, lat, ns, lon, ew):
+    def _parse_attrs(self, parsers: Dict[str, Callable]) -> Dict[str, Any]:
+        """Parse a block of `name ":" value NL` lines"""
+        def parse_attr():
+            name = self._expect('NAME')
+            parse_value = parsers.get(name)
+            if parse_value is None:
+                raise self._error(f"Unknown attribute {name!r}")
+            self._expect('OP', ':')
+            value = parse_value(self)
+            self._expect('NL')
+            return (name, value)
+        return dict(self._parse_block(parse_attr))
+    
+    # Terminals
+    
+    def parse_string(self) -> str:
+        return self._expect('STRING')[1:-1]  # Remove quotes
+    
+    def parse_number(self) -> float:
+        return float(self._expect('NUMBER'))
+    
+    def parse_unit(self) -> str:
+        kind, unit, _ = self._next()
+        if kind in ('NL', 'EOF'):
+            raise self._error("Expected a unit")
+        if unit not in _UNITS:
+            raise self._error(f"Unknown unit {unit!r}")
+        return sys.intern(unit)
+    
+    def parse_quantity(self) -> Quantity:
+        value = self.parse_number()
+        return Quantity(value, self.parse_unit())
+    
+    def parse_angle(self) -> float:
+        value = self.parse_number()
+        self._expect('OP', '°')
+        return value
+    
+    def parse_duration(self) -> str:
+        value = self.parse_number()
+        return f"{value:g} {self.parse_unit()}"
+    
+    def parse_coordinate(self) -> Coordinate:
+        lat = self.parse_angle()
+        ns = self._expect_one_of(('N', 'S'))
+        self._expect('OP', ',')
+        lon = self.parse_angle()
+        ew = self._expect_one_of(('E', 'W'))
         lat_val = lat if ns == "N" else -lat
         lon_val = lon if ew == "E" else -lon
         return Coordinate(lat_val, lon_val)
     
-    @v_args(inline=True)
-    def quantity(self, value, unit):
-        return Quantity(value, str(unit))
-    
-    @v_args(inline=True)
-    def angle(self, value):
-        return float(value)
+    def parse_name_list(self) -> List[str]:
+        self._expect('OP', '[')
+        names = [self._expect('NAME')]
+        while self._accept('OP', ','):
+            names.append(self._expect('NAME'))
+        self._expect('OP', ']')
+        return names
     
-    @v_args(inline=True)
-    def duration(self, value, unit):
-        return f"{value}{unit}"
+    # Site
     
-    def site_attr(self, items):
-        attr_name = items[0].data
-        value = items[1]
-        return (attr_name, value)
+    def parse_terrain(self) -> str:
+        return sys.intern(self.parse_string())
     
-    def site_def(self, items):
-        name = items[0]
-        attrs = dict(items[1:])
+    def parse_site(self) -> Site:
+        self._expect('NAME', 'site')
+        name = self.parse_string()
+        attrs = self._parse_attrs(self._SITE_ATTRS)
         
         self.model.site = Site(
             name=name,
@@ -152,51 +204,78 @@ class RenewDSLTransformer(Transformer):
         )
         return self.model.site
     
-    @v_args(inline=True)
-    def equipment_type(self, type_name):
-        return str(type_name)
-    
-    def equipment_spec(self, items):
-        spec_name = str(items[0])
-        value = items[1]
-        return (spec_name, value)
-    
-    def spec_block(self, items):
-        return dict(items)
-    
-    def equipment_item(self, items):
-        eq_type = items[0]
-        name = items[1]
-        specs = items[2] if len(items) > 2 else {}
+    # Equipment
+    
+    def parse_equipment(self) -> List[Equipment]:
+        self._expect('NAME', 'equipment')
+        return self._parse_block(self.parse_equipment_item)
+    
+    def parse_equipment_item(self) -> Equipment:
+        eq_type = self._expect_one_of(_EQUIPMENT_TYPES)
+        name = self.parse_string()
+        if name in self.model.equipment:
+            raise self._error(f"Duplicate equipment {name!r}")
+        specs = {}
+        if self._peek()[:2] == ('OP', ':'):
+            self._parse_block(lambda: self.parse_equipment_spec(specs))
+        else:
+            self._expect('NL')
         
         equipment = Equipment(
             type=eq_type,
             name=name,
             specs=specs
         )
-        self.model.equipment.append(equipment)
+        self.model.equipment[name] = equipment
         return equipment
     
-    def equipment_section(self, items):
-        return items
+    def parse_equipment_spec(self, specs: Dict[str, Any]) -> Tuple[str, Any]:
+        spec_name = self._expect('NAME')
+        self._expect('OP', ':')
+        unit = None
+        if self._peek()[0] == 'STRING':
+            value = self.parse_string()
+        else:
+            value = self.parse_number()
+            if self._peek()[1] in _UNITS:
+                unit = self.parse_unit()
+        
+        if unit in _POWER_UNITS_W:
+            # Power ratings are stored once as plain watts, e.g. capacity_w
+            key = spec_name if spec_name.endswith('_w') else f"{spec_name}_w"
+            value = value * _POWER_UNITS_W[unit]
+        elif spec_name in _POWER_SPECS or spec_name.endswith('_w'):
+            raise self._error(f"Spec {spec_name!r} needs a power unit (W, kW or MW)")
+        else:
+            key = spec_name
+            if unit is not None:
+                value = Quantity(value, unit)
+        
+        if key in specs:
+            raise self._error(f"Duplicate spec {key!r}")
+        specs[key] = value
+        self._expect('NL')
+        return (key, value)
+    
+    # Layout
     
-    @v_args(inline=True)
-    def equipment_ref(self, name, count=None):
+    def parse_equipment_ref(self) -> EquipmentRef:
+        name = self._expect('NAME')
+        count = self.parse_number() if self._accept('OP', '*') else None
         return EquipmentRef(name, int(count) if count else None)
     
-    @v_args(inline=True)
-    def tracking_mode(self, mode):
-        mode_str = str(mode)
-        return TrackingMode(mode_str)
+    def parse_orientation(self) -> Orientation:
+        return Orientation(self._expect_one_of(_ORIENTATIONS))
     
-    def layout_attr(self, items):
-        attr_name = items[0].data
-        value = items[1]
-        return (attr_name, value)
+    def parse_tracking_mode(self) -> TrackingMode:
+        return TrackingMode(self._expect_one_of(_TRACKING_MODES))
     
-    def layout_def(self, items):
-        name = items[0]
-        attrs = dict(items[1:])
+    def parse_layout(self) -> Layout:
+        self._expect('NAME', 'layout')
+        name = self.parse_string()
+        if name in self.model.layouts:
+            raise self._error(f"Duplicate layout {name!r}")
+        attrs = self._parse_attrs(self._LAYOUT_ATTRS)
         
         layout = Layout(
             name=name,
@@ -207,47 +286,48 @@ class RenewDSLTransformer(Transformer):
             row_spacing=attrs.get('row_spacing'),
             tracking=attrs.get('tracking')
         )
-        self.model.layouts.append(layout)
+        self.model.layouts[name] = layout
         return layout
     
-    def weather_source(self, items):
-        provider = items[0]
-        args = items[1:]
-        return WeatherSource(provider, args)
+    # Simulation
     
-    def output_list(self, items):
-        return [str(item) for item in items]
+    def parse_weather_source(self) -> WeatherSource:
+        provider = self._expect('NAME')
+        self._expect('OP', '(')
+        args = [self.parse_string()]
+        while self._accept('OP', ','):
+            args.append(self.parse_string())
+        self._expect('OP', ')')
+        return WeatherSource(provider, tuple(args))
     
-    def simulate_attr(self, items):
-        attr_name = items[0].data
-        value = items[1]
-        return (attr_name, value)
+    def parse_aoi_model(self) -> str:
+        return self._expect_one_of(_AOI_MODELS)
     
-    def simulate_def(self, items):
-        attrs = dict(items)
+    def parse_simulate(self) -> Simulation:
+        self._expect('NAME', 'simulate')
+        attrs = self._parse_attrs(self._SIMULATE_ATTRS)
         
         self.model.simulation = Simulation(
             weather=attrs.get('weather'),
             duration=attrs.get('duration'),
             timestep=attrs.get('timestep'),
-            outputs=attrs.get('outputs')
+            outputs=attrs.get('outputs'),
+            aoi_model=attrs.get('aoi_model')
         )
         return self.model.simulation
     
-    @v_args(inline=True)
-    def objective_expr(self, mode, target):
-        return Objective(str(mode), str(target))
+    # Optimization
     
-    def variable_list(self, items):
-        return [str(item) for item in items]
+    def parse_objective(self) -> Objective:
+        mode = self._expect_one_of(_OBJECTIVE_MODES)
+        self._expect('OP', '(')
+        target = self._expect('NAME')
+        self._expect('OP', ')')
+        return Objective(mode, target)
     
-    def optimize_attr(self, items):
-        attr_name = items[0].data
-        value = items[1]
-        return (attr_name, value)
-    
-    def optimize_def(self, items):
-        attrs = dict(items)
+    def parse_optimize(self) -> Optimization:
+        self._expect('NAME', 'optimize')
+        attrs = self._parse_attrs(self._OPTIMIZE_ATTRS)
         
         self.model.optimization = Optimization(
             objective=attrs.get('objective'),
@@ -256,48 +336,92 @@ class RenewDSLTransformer(Transformer):
         )
         return self.model.optimization
     
-    def statement(self, items):
-        return items[0]
+    # Top level
+    
+    def parse_statement(self):
+        kind, value, line = self._peek()
+        parse_stmt = self._STATEMENTS.get(value) if kind == 'NAME' else None
+        if parse_stmt is None:
+            raise self._error(f"Expected a statement, got {value!r}", line)
+        return parse_stmt(self)
     
-    def start(self, items):
+    def parse(self) -> Model:
+        self.parse_statement()
+        while self._peek()[0] != 'EOF':
+            self.parse_statement()
         return self.model
+    
+    _SITE_ATTRS = {
+        'location': parse_coordinate,
+        'area': parse_quantity,
+        'terrain': parse_terrain,
+        'irradiance': parse_quantity,
+        'elevation': parse_quantity,
+    }
+    _LAYOUT_ATTRS = {
+        'panels': parse_equipment_ref,
+        'inverters': parse_equipment_ref,
+        'orientation': parse_orientation,
+        'tilt': parse_angle,
+        'row_spacing': parse_quantity,
+        'tracking': parse_tracking_mode,
+    }
+    _SIMULATE_ATTRS = {
+        'weather': parse_weather_source,
+        'duration': parse_duration,
+        'timestep': parse_duration,
+        'outputs': parse_name_list,
+        'aoi_model': parse_aoi_model,
+    }
+    _OPTIMIZE_ATTRS = {
+        'objective': parse_objective,
+        'variables': parse_name_list,
+        'algorithm': parse_string,
+    }
+    _STATEMENTS = {
+        'site': parse_site,
+        'equipment': parse_equipment,
+        'layout': parse_layout,
+        'simulate': parse_simulate,
+        'optimize': parse_optimize,
+    }
 
 
 class IndentPreprocessor:
     """Convert indentation to INDENT/DEDENT tokens"""
     
     def __init__(self, text: str):
-        self.lines = text.split('\n')
+        self.lines = text.splitlines()
         self.output = []
         self.indent_stack = [0]
     
     def process(self) -> str:
+        output = self.output
+        indent_stack = self.indent_stack
         for line in self.lines:
-            if not line.strip():
-                self.output.append('')
+            # Measure the space prefix once, in C, and keep the rest of the line
+            stripped = line.lstrip(' ')
+            indent = len(line) - len(stripped)
+            if not stripped or stripped.isspace():
+                output.append('')
                 continue
             
-            # Calculate indentation level
-            indent = len(line) - len(line.lstrip())
-            
             # Handle indent changes
-            if indent > self.indent_stack[-1]:
-                self.indent_stack.append(indent)
-                self.output.append(line.replace(' ' * indent, '<INDENT>' * (len(self.indent_stack) - 1), 1))
-            elif indent < self.indent_stack[-1]:
-                while self.indent_stack and indent < self.indent_stack[-1]:
-                    self.indent_stack.pop()
-                    self.output.append('<DEDENT>')
-                self.output.append(line)
+            if indent > indent_stack[-1]:
+                indent_stack.append(indent)
+                output.append('<INDENT>' + stripped)
             else:
-                self.output.append(line)
+                while indent < indent_stack[-1]:
+                    indent_stack.pop()
+                    output.append('<DEDENT>')
+                output.append(stripped)
         
         # Close remaining indents
-        while len(self.indent_stack) > 1:
-            self.indent_stack.pop()
-            self.output.append('<DEDENT>')
+        while len(indent_stack) > 1:
+            indent_stack.pop()
+            output.append('<DEDENT>')
         
-        return '\n'.join(self.output)
+        return '\n'.join(output)
 
 
 def parse(dsl_text: str) -> Model:
@@ -307,15 +431,8 @@ def parse(dsl_text: str) -> Model:
     preprocessor = IndentPreprocessor(dsl_text)
     processed_text = preprocessor.process()
     
-    # Parse with Lark
-    parser = Lark(GRAMMAR, parser='lalr', start='start')
-    tree = parser.parse(processed_text)
-    
-    # Transform to AST
-    transformer = RenewDSLTransformer()
-    model = transformer.transform(tree)
-    
-    return model
+    # Parse straight into AST nodes
+    return Parser(processed_text).parse()
 
 
 if __name__ == "__main__":
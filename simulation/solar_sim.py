@@ -3,6 +3,8 @@ RenewDSL Solar Simulation Engine
 File: renewdsl/simulation/solar_sim.py
 """
 
+import functools
+import logging
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
@@ -11,13 +13,94 @@ import pvlib
 from pvlib import location, pvsystem, modelchain, temperature
 
 
+logger = logging.getLogger(__name__)
+
+
+# Weather index shared by generate_weather_data and the cached temperature
+# envelope; both must agree for the envelope to line up with the timestamps
+_WEATHER_TZ = 'UTC'
+_WEATHER_FREQ = '1H'
+
+_UNIT_TO_DAYS = {
+    'h': 1 / 24, 'hour': 1 / 24, 'hours': 1 / 24,
+    'day': 1, 'days': 1,
+    'year': 365, 'years': 365,
+}
+
+
+def _parse_duration(duration):
+    """Convert a '<value> <unit>' duration string to a timedelta"""
+    malformed = f"Malformed duration '{duration}', expected '<value> <unit>'"
+    parts = duration.split()
+    if len(parts) != 2:
+        raise ValueError(malformed)
+    value, unit = parts
+    try:
+        value = float(value)
+    except ValueError:
+        raise ValueError(malformed) from None
+    days_per_unit = _UNIT_TO_DAYS.get(unit)
+    if days_per_unit is None:
+        raise ValueError(f"Unsupported duration unit '{unit}' in '{duration}'")
+    return timedelta(days=days_per_unit * value)
+
+
+# Repeated simulations over the same period (e.g. optimization sweeps) reuse
+# the cached, read-only array instead of re-evaluating the trig terms
+@functools.lru_cache(maxsize=8)
+def _temperature_envelope(start_ns, n):
+    """Seasonal plus daily temperature cycle for n hourly steps from start_ns (UTC)"""
+    times = pd.date_range(pd.Timestamp(start_ns, tz=_WEATHER_TZ), periods=n, freq=_WEATHER_FREQ)
+    
+    # Base temperature varies by season
+    envelope = np.subtract(times.dayofyear.values, 200, dtype=np.float64)
+    envelope *= 2 * np.pi / 365
+    np.cos(envelope, out=envelope)
+    envelope *= 15
+    envelope += 15
+    # Daily variation
+    temp_daily = np.subtract(times.hour.values, 6, dtype=np.float64)
+    temp_daily *= 2 * np.pi / 24
+    np.sin(temp_daily, out=temp_daily)
+    temp_daily *= 10
+    envelope += temp_daily
+    
+    envelope.flags.writeable = False
+    return envelope
+
+
+def _synth_weather(temp_envelope, ghi_cs, dni_cs, dhi_cs,
+                   cloud_cover, temp_noise, out_ghi, out_dni, out_dhi, out_temp):
+    """Fill synthetic weather arrays in place from clear-sky data and noise"""
+    # Irradiance attenuated by cloud cover
+    np.multiply(cloud_cover, -0.8, out=out_ghi)
+    out_ghi += 1
+    out_ghi *= ghi_cs
+    np.multiply(cloud_cover, -0.9, out=out_dni)
+    out_dni += 1
+    out_dni *= dni_cs
+    np.multiply(cloud_cover, 100, out=out_dhi)
+    out_dhi += dhi_cs
+    
+    # Temperature model (simplified): seasonal/daily cycle plus noise
+    np.add(temp_envelope, temp_noise, out=out_temp)
+
+
 class SolarSimulator:
     """Simulates solar PV system performance using pvlib"""
     
+    _AZIMUTH = {
+        'south': 180,
+        'north': 0,
+        'east': 90,
+        'west': 270,
+        None: 180  # Default to south
+    }
+    
     def __init__(self, model):
         self.model = model
         self.site = model.site
-        self.layout = model.layouts[0] if model.layouts else None
+        self.layout = next(iter(model.layouts.values()), None)
         self.simulation = model.simulation
         self.results = None
     
@@ -34,17 +117,13 @@ class SolarSimulator:
         """Create PV system from layout and equipment"""
         # Get panel specs
         panel_name = self.layout.panels.name
-        panel = next((e for e in self.model.equipment if e.name == panel_name), None)
+        panel = self.model.equipment.get(panel_name)
         
         if not panel:
             raise ValueError(f"Panel '{panel_name}' not found in equipment")
         
         # Extract specifications
-        capacity_w = panel.specs.get('capacity', Quantity(400, 'W')).value
-        if isinstance(capacity_w, str):
-            capacity_w = float(capacity_w.replace('kW', '').replace('W', '')) 
-            if 'kW' in str(panel.specs.get('capacity')):
-                capacity_w *= 1000
+        capacity_w = panel.specs.get('capacity_w', 400.0)
         
         # Create simple PV system parameters
         modules_per_string = 20
@@ -57,6 +136,7 @@ class SolarSimulator:
             module_parameters={
                 'pdc0': capacity_w,
                 'gamma_pdc': -0.004,  # Temperature coefficient
+                'b': 0.05,  # ASHRAE incidence angle modifier
             },
             inverter_parameters={
                 'pdc0': capacity_w * modules_per_string * strings * 0.95,
@@ -68,90 +148,74 @@ class SolarSimulator:
         return system
     
     def _orientation_to_azimuth(self, orientation):
-        """Convert orientation string to azimuth angle"""
-        mapping = {
-            'south': 180,
-            'north': 0,
-            'east': 90,
-            'west': 270,
-            None: 180  # Default to south
-        }
-        return mapping.get(orientation, 180)
+        """Convert orientation (Orientation or string) to azimuth angle"""
+        return self._AZIMUTH.get(getattr(orientation, 'value', orientation), 180)
     
     def generate_weather_data(self, loc, start_date, end_date):
         """Generate synthetic weather data (TMY-like)"""
         # Create hourly timestamps
-        times = pd.date_range(start_date, end_date, freq='1H', tz='UTC')
+        times = pd.date_range(start_date, end_date, freq=_WEATHER_FREQ, tz=_WEATHER_TZ)
         
         # Generate synthetic clear-sky data
         clearsky = loc.get_clearsky(times)
         
         # Add some realistic variability
-        np.random.seed(42)
-        cloud_cover = np.random.beta(2, 5, size=len(times))  # More clear days than cloudy
-        ghi = clearsky['ghi'] * (1 - cloud_cover * 0.8)
-        dni = clearsky['dni'] * (1 - cloud_cover * 0.9)
-        dhi = clearsky['dhi'] + cloud_cover * 100
-        
-        # Temperature model (simplified)
-        day_of_year = times.dayofyear
-        hour_of_day = times.hour
-        
-        # Base temperature varies by season
-        temp_base = 15 + 15 * np.cos(2 * np.pi * (day_of_year - 200) / 365)
-        # Daily variation
-        temp_daily = 10 * np.sin(2 * np.pi * (hour_of_day - 6) / 24)
-        temp_air = temp_base + temp_daily + np.random.normal(0, 2, size=len(times))
-        
-        # Wind speed
-        wind_speed = np.random.gamma(2, 2, size=len(times))
+        n = len(times)
+        rng = np.random.default_rng(42)
+        cloud_cover = rng.beta(2, 5, size=n)  # More clear days than cloudy
+        temp_noise = rng.normal(0, 2, size=n)
+        wind_speed = rng.gamma(2, 2, size=n)
+        
+        # One column-major buffer holds every weather series, so each column
+        # is contiguous and the DataFrame wraps it without copying
+        data = np.empty((n, 5), order='F')
+        _synth_weather(
+            _temperature_envelope(times[0].value, n),
+            clearsky['ghi'].values, clearsky['dni'].values, clearsky['dhi'].values,
+            cloud_cover, temp_noise,
+            data[:, 0], data[:, 1], data[:, 2], data[:, 3]
+        )
+        data[:, 4] = wind_speed
         
-        weather = pd.DataFrame({
-            'ghi': ghi,
-            'dni': dni,
-            'dhi': dhi,
-            'temp_air': temp_air,
-            'wind_speed': wind_speed
-        }, index=times)
+        weather = pd.DataFrame(
+            data,
+            index=times,
+            columns=['ghi', 'dni', 'dhi', 'temp_air', 'wind_speed'],
+            copy=False
+        )
         
         return weather
     
     def run_simulation(self):
         """Run the complete solar simulation"""
-        print("Starting solar simulation...")
+        logger.info("Starting solar simulation...")
         
         # Create location and system
         loc = self.create_location()
         system = self.create_system()
         
         # Parse duration
-        duration = self.simulation.duration if self.simulation else "1 year"
+        duration = (self.simulation.duration if self.simulation else None) or "1 year"
         start_date = datetime(2023, 1, 1)
+        end_date = start_date + _parse_duration(duration)
         
-        if 'year' in duration:
-            years = int(duration.split()[0])
-            end_date = start_date + timedelta(days=365 * years)
-        elif 'day' in duration:
-            days = int(duration.split()[0])
-            end_date = start_date + timedelta(days=days)
-        else:
-            end_date = start_date + timedelta(days=365)
-        
-        print(f"Simulating from {start_date} to {end_date}")
+        logger.info("Simulating from %s to %s", start_date, end_date)
         
         # Generate weather data
-        print("Generating weather data...")
+        logger.info("Generating weather data...")
         weather = self.generate_weather_data(loc, start_date, end_date)
         
-        # Create model chain for simulation
+        # Create model chain for simulation; the single-polynomial ASHRAE
+        # IAM is much cheaper per timestep than the 'physical' model
+        aoi_model = (self.simulation.aoi_model if self.simulation else None) or 'ashrae'
         mc = modelchain.ModelChain(
             system, loc,
-            aoi_model='physical',
+            aoi_model=aoi_model,
             spectral_model='no_loss'
         )
         
         # Run simulation
-        print("Running PV model...")
+        logger.info("Running PV model...")
         mc.run_model(weather)
         
         # Extract results
@@ -165,30 +229,34 @@ class SolarSimulator:
         # Calculate metrics
         self._calculate_metrics()
         
-        print("Simulation complete!")
+        logger.info("Simulation complete!")
         return self.results
     
     def _calculate_metrics(self):
         """Calculate performance metrics"""
-        ac_power = self.results['ac_power']
+        # Reduce the raw array directly, skipping NaN like pandas; the only
+        # allocation is the boolean mask for the sum
+        ac_power = np.asarray(self.results['ac_power'], dtype=np.float64)
+        hours_in_period = ac_power.shape[0]
         
-        # Total energy (kWh)
+        # Total energy (kWh), scaling by the timestep after the reduction
         timestep_hours = 1  # Assuming hourly data
-        total_energy_kwh = (ac_power * timestep_hours).sum() / 1000
+        valid = np.isnan(ac_power)
+        np.logical_not(valid, out=valid)
+        total_energy_kwh = np.add.reduce(ac_power, where=valid) * timestep_hours / 1000
         
         # System capacity
-        panel = self.model.equipment[0]
-        capacity_w = float(str(panel.specs.get('capacity', '400 W')).replace('kW', '000').replace('W', '').strip())
+        panel = self.model.equipment[self.layout.panels.name]
+        capacity_w = panel.specs.get('capacity_w', 400.0)
         panel_count = self.layout.panels.count if self.layout.panels.count else 1000
         system_capacity_kw = (capacity_w * panel_count) / 1000
         
         # Capacity factor
-        hours_in_period = len(ac_power)
         max_possible_energy = system_capacity_kw * hours_in_period
         capacity_factor = (total_energy_kwh / max_possible_energy) * 100 if max_possible_energy > 0 else 0
         
         # Peak power
-        peak_power_kw = ac_power.max() / 1000
+        peak_power_kw = np.fmax.reduce(ac_power) / 1000
         
         # Average daily generation
         days = hours_in_period / 24
@@ -211,35 +279,44 @@ class SolarSimulator:
         
         metrics = self.results['metrics']
         
-        print("\n" + "="*60)
-        print("SOLAR SIMULATION RESULTS")
-        print("="*60)
-        print(f"Site: {self.site.name}")
-        print(f"Location: {self.site.location}")
-        print(f"System Capacity: {metrics['system_capacity_kw']:.2f} kW")
-        print("-"*60)
-        print(f"Total Energy Generated: {metrics['total_energy_kwh']:,.2f} kWh")
-        print(f"Capacity Factor: {metrics['capacity_factor_pct']:.2f}%")
-        print(f"Peak Power Output: {metrics['peak_power_kw']:.2f} kW")
-        print(f"Average Daily Generation: {metrics['avg_daily_kwh']:.2f} kWh/day")
-        print(f"Simulation Period: {metrics['simulation_hours']:,} hours")
-        print("="*60 + "\n")
+        lines = [
+            "",
+            "="*60,
+            "SOLAR SIMULATION RESULTS",
+            "="*60,
+            f"Site: {self.site.name}",
+            f"Location: {self.site.location}",
+            f"System Capacity: {metrics['system_capacity_kw']:.2f} kW",
+            "-"*60,
+            f"Total Energy Generated: {metrics['total_energy_kwh']:,.2f} kWh",
+            f"Capacity Factor: {metrics['capacity_factor_pct']:.2f}%",
+            f"Peak Power Output: {metrics['peak_power_kw']:.2f} kW",
+            f"Average Daily Generation: {metrics['avg_daily_kwh']:.2f} kWh/day",
+            f"Simulation Period: {metrics['simulation_hours']:,} hours",
+            "="*60,
+            "",
+        ]
+        # Emit the whole block in one write
+        print("\n".join(lines))
     
     def export_results(self, filename='simulation_results.csv'):
         """Export results to CSV"""
         if not self.results:
-            print("No results to export.")
+            logger.warning("No results to export.")
             return
         
+        # Every column shares the weather index, so pass raw arrays and skip
+        # index alignment and copies when assembling the export frame
+        weather = self.results['weather']
         df = pd.DataFrame({
             'timestamp': self.results['times'],
-            'ac_power_w': self.results['ac_power'],
-            'ghi': self.results['weather']['ghi'],
-            'temp_air': self.results['weather']['temp_air']
-        })
+            'ac_power_w': np.asarray(self.results['ac_power']),
+            'ghi': weather['ghi'].to_numpy(),
+            'temp_air': weather['temp_air'].to_numpy()
+        }, copy=False)
         
         df.to_csv(filename, index=False)
-        print(f"Results exported to {filename}")
+        logger.info("Results exported to %s", filename)
 
 
 # Wrapper class for easy import
@@ -264,23 +341,23 @@ if __name__ == "__main__":
         irradiance=Quantity(6.2, "kWh/m²/day")
     )
     
-    model.equipment = [
-        Equipment(
+    model.equipment = {
+        "TestPanel": Equipment(
             type="panel",
             name="TestPanel",
-            specs={'capacity': Quantity(400, 'W'), 'efficiency': 22.5}
+            specs={'capacity_w': 400.0, 'efficiency': 22.5}
         )
-    ]
+    }
     
-    model.layouts = [
-        Layout(
+    model.layouts = {
+        "main": Layout(
             name="main",
             panels=EquipmentRef("TestPanel", 1000),
             orientation="south",
             tilt=30.0,
             tracking=TrackingMode.FIXED
         )
-    ]
+    }
     
     model.simulation = Simulation(
         duration="30 day",
@@ -289,6 +366,7 @@ if __name__ == "__main__":
     )
     
     # Run simulation
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     sim = SolarSimulator(model)
     sim.run_simulation()
     sim.print_summary()
@@ -0,0 +1,188 @@
+import pytest
+
+from parser.parser import parse, ParseError
+from parser.ast_nodes import Orientation, Quantity, TrackingMode, WeatherSource
+
+
+DEMO_DSL = """
+site "Test Solar Farm":
+    location: 35.0°N, 115.0°W
+    area: 50 hectares
+    irradiance: 6.2 kWh/m²/day
+
+equipment:
+    panel "TestPanel":
+        capacity: 400 kW
+        efficiency: 22.5
+
+layout "main":
+    panels: TestPanel * 1000
+    orientation: south
+    tilt: 30°
+    tracking: fixed
+
+simulate:
+    duration: 1 year
+    timestep: 1 hour
+    outputs: [generation, capacity_factor]
+"""
+
+
+def test_demo_model():
+    model = parse(DEMO_DSL)
+
+    assert model.site.name == "Test Solar Farm"
+    assert model.site.location.latitude == 35.0
+    assert model.site.location.longitude == -115.0
+    assert model.site.area == Quantity(50.0, "hectares")
+    assert model.site.irradiance == Quantity(6.2, "kWh/m²/day")
+
+    panel = model.equipment["TestPanel"]
+    assert panel.type == "panel"
+    assert panel.specs == {"capacity_w": 400000.0, "efficiency": 22.5}
+
+    layout = model.layouts["main"]
+    assert layout.panels.name == "TestPanel"
+    assert layout.panels.count == 1000
+    assert layout.orientation is Orientation.SOUTH
+    assert layout.tilt == 30.0
+    assert layout.tracking is TrackingMode.FIXED
+
+    assert model.simulation.duration == "1 year"
+    assert model.simulation.timestep == "1 hour"
+    assert model.simulation.outputs == ["generation", "capacity_factor"]
+
+
+def test_crlf_input():
+    model = parse(DEMO_DSL.replace("\n", "\r\n"))
+
+    assert model.site.name == "Test Solar Farm"
+    assert model.layouts["main"].tracking is TrackingMode.FIXED
+
+
+def test_missing_trailing_newline():
+    model = parse('site "A":\n    location: 1°S, 2°E')
+
+    assert model.site.location.latitude == -1.0
+    assert model.site.location.longitude == 2.0
+
+
+def test_blank_lines_inside_blocks():
+    model = parse(
+        'equipment:\n'
+        '    panel "P":\n'
+        '\n'
+        '        capacity: 400 W\n'
+        '    \n'
+        '        efficiency: 20\n'
+        '\n'
+        '    inverter "I"\n'
+    )
+
+    assert model.equipment["P"].specs == {"capacity_w": 400.0, "efficiency": 20.0}
+    assert "I" in model.equipment
+
+
+def test_equipment_with_and_without_spec_block():
+    model = parse(
+        'equipment:\n'
+        '    inverter "I"\n'
+        '    panel "P":\n'
+        '        model: "X-400"\n'
+        '    battery "B"\n'
+    )
+
+    assert list(model.equipment) == ["I", "P", "B"]
+    assert model.equipment["I"].specs == {}
+    assert model.equipment["P"].specs == {"model": "X-400"}
+    assert model.equipment["B"].type == "battery"
+
+
+def test_unknown_attribute_raises():
+    with pytest.raises(ParseError, match="Unknown attribute 'color'"):
+        parse('site "A":\n    color: "red"\n')
+
+
+def test_unknown_unit_raises():
+    with pytest.raises(ParseError, match="Unknown unit 'furlongs'"):
+        parse('site "A":\n    area: 3 furlongs\n')
+
+
+@pytest.mark.parametrize("capacity", ["400", '"400 W"', "400 m"])
+def test_capacity_without_power_unit_raises(capacity):
+    with pytest.raises(ParseError, match="needs a power unit"):
+        parse(f'equipment:\n    panel "P":\n        capacity: {capacity}\n')
+
+
+def test_canonical_watt_key_without_power_unit_raises():
+    with pytest.raises(ParseError, match="Spec 'capacity_w' needs a power unit"):
+        parse('equipment:\n    panel "P":\n        capacity_w: 3\n')
+
+
+def test_watt_suffixed_spec_is_not_suffixed_twice():
+    model = parse('equipment:\n    inverter "I":\n        rated_w: 5 kW\n')
+
+    assert model.equipment["I"].specs == {"rated_w": 5000.0}
+
+
+def test_duplicate_spec_raises():
+    with pytest.raises(ParseError, match="Duplicate spec 'capacity_w'"):
+        parse(
+            'equipment:\n'
+            '    panel "P":\n'
+            '        capacity: 5 kW\n'
+            '        capacity_w: 3 W\n'
+        )
+
+
+@pytest.mark.parametrize("text, message", [
+    ('\nsite "A":\n    location: 1°N, 2°E\n\n    area: 3 furlongs\n',
+     "line 5: Unknown unit 'furlongs'"),
+    ('site "A":\r\n    location: 1°N, 2°E\r\nequipment:\r\n'
+     '    panel "P":\r\n        efficiency 22.5\r\n',
+     "line 5: Expected ':', got '22.5'"),
+    ('equipment:\n    panel "P"\n\nlayout "L":\n    tilt: 3°\n'
+     'simulate:\n    duration: 1 day\n# comment\n',
+     "line 8: Unexpected character '#'"),
+    ('site "A":\n    location: 1°N, 2°E\n    area: 3',
+     "line 3: Expected a unit"),
+])
+def test_errors_report_source_line(text, message):
+    with pytest.raises(ParseError, match=message):
+        parse(text)
+
+
+def test_duplicate_equipment_raises():
+    with pytest.raises(ParseError, match="Duplicate equipment 'P'"):
+        parse('equipment:\n    panel "P"\n    inverter "P"\n')
+
+
+def test_duplicate_layout_raises():
+    with pytest.raises(ParseError, match="Duplicate layout 'main'"):
+        parse('layout "main":\n    tilt: 10°\nlayout "main":\n    tilt: 20°\n')
+
+
+def test_aoi_model_round_trips():
+    model = parse('simulate:\n    duration: 1 day\n    aoi_model: physical\n')
+
+    assert model.simulation.aoi_model == "physical"
+
+
+def test_unknown_aoi_model_raises():
+    with pytest.raises(ParseError, match="got 'sapm'"):
+        parse('simulate:\n    aoi_model: sapm\n')
+
+
+def test_plural_duration_units():
+    model = parse('simulate:\n    duration: 2 years\n    timestep: 1 hours\n')
+
+    assert model.simulation.duration == "2 years"
+    assert model.simulation.timestep == "1 hours"
+
+
+def test_weather_source_is_hashable():
+    model = parse('simulate:\n    weather: tmy("35.0", "-115.0")\n')
+
+    weather = model.simulation.weather
+    assert weather.args == ("35.0", "-115.0")
+    assert hash(weather) == hash(WeatherSource("tmy", ("35.0", "-115.0")))
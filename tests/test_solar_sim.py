@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pvlib")
+
+import pandas as pd
+
+from simulation.solar_sim import (
+    _WEATHER_FREQ, _WEATHER_TZ, _parse_duration, _temperature_envelope
+)
+
+
+@pytest.mark.parametrize("duration, expected", [
+    ("1 year", timedelta(days=365)),
+    ("2 years", timedelta(days=730)),
+    ("30 day", timedelta(days=30)),
+    ("1.5 days", timedelta(days=1.5)),
+    ("12 hour", timedelta(hours=12)),
+    ("6 h", timedelta(hours=6)),
+])
+def test_parse_duration(duration, expected):
+    assert _parse_duration(duration) == expected
+
+
+def test_parse_duration_unknown_unit_raises():
+    with pytest.raises(ValueError, match="Unsupported duration unit 'fortnight'"):
+        _parse_duration("3 fortnight")
+
+
+@pytest.mark.parametrize("duration", ["1year", "year", "one year", "1 year extra"])
+def test_parse_duration_malformed_raises(duration):
+    with pytest.raises(ValueError, match="Malformed duration"):
+        _parse_duration(duration)
+
+
+def test_temperature_envelope_matches_seasonal_and_daily_cycle():
+    times = pd.date_range(datetime(2023, 1, 1), datetime(2024, 1, 1),
+                          freq=_WEATHER_FREQ, tz=_WEATHER_TZ)
+    day_of_year = times.dayofyear.values
+    hour_of_day = times.hour.values
+    expected = (15 + 15 * np.cos(2 * np.pi * (day_of_year - 200) / 365)
+                + 10 * np.sin(2 * np.pi * (hour_of_day - 6) / 24))
+
+    envelope = _temperature_envelope(times[0].value, len(times))
+
+    np.testing.assert_allclose(envelope, expected, rtol=0, atol=1e-12)
+    assert not envelope.flags.writeable